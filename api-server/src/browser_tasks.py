@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+from collections.abc import Callable
+from typing import Any
+
 from langchain_google_genai import ChatGoogleGenerativeAI
 from browser_use import Agent, BrowserProfile, BrowserSession
+from browser_use.agent.views import ActionResult, AgentHistory
 
 import conf
+import trace_store
 from models import Folder
 
 logger = logging.getLogger(__name__)
@@ -13,6 +19,13 @@ logger = logging.getLogger(__name__)
 # LangChain-Google setup – keep env var in a single place
 os.environ["GOOGLE_API_KEY"] = conf.GOOGLE_API_KEY
 
+# The prompt only carries <secret>…</secret> placeholders; browser-use substitutes
+# the real values at action time, so the LLM and operator traces never see them.
+SENSITIVE_DATA: dict[str, str] = {
+    "nessus_username": conf.NESSUS_USERNAME,
+    "nessus_password": conf.NESSUS_PASSWORD,
+}
+
 
 def build_scan_prompt(target: str, scan_name: str, scan_type: str, folder: Folder) -> str:  # unchanged
     return f"""
@@ -20,7 +33,7 @@ def build_scan_prompt(target: str, scan_name: str, scan_type: str, folder: Folde
 Nessus Essentials one-off “{scan_type}”
 ──────────────────────────────────────────────────────────────────────────────
 Instance URL …… {conf.NESSUS_URL}
-Login (if asked) … Username {conf.NESSUS_USERNAME} Password {conf.NESSUS_PASSWORD}
+Login (if asked) … Username <secret>nessus_username</secret> Password <secret>nessus_password</secret>
 Target ………… "{target}"
 ──────────────────────────────────────────────────────────────────────────────
 
@@ -64,19 +77,62 @@ Constraints:
 """
 
 
+def _redact(value: Any) -> Any:
+    """Mask the Nessus password inside any string of *value* (keys left untouched)."""
+    password = SENSITIVE_DATA["nessus_password"]
+    if not password:
+        return value
+    if isinstance(value, str):
+        return value.replace(password, "<secret>nessus_password</secret>")
+    if isinstance(value, dict):
+        return {k: _redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value]
+    return value
+
+
+def _step_record(item: AgentHistory, fallback_step: int) -> dict[str, Any]:
+    """Compact, JSON-safe summary of one agent step (no DOM / screenshot)."""
+    meta = item.metadata
+    actions = item.model_output.action if item.model_output else []
+    errors = [r.error for r in item.result if r.error]
+    return _redact({
+        "step": meta.step_number if meta else fallback_step,
+        "actions": [a.model_dump(exclude_unset=True) for a in actions],
+        "url": item.state.url or None,
+        "duration_s": meta.duration_seconds if meta else None,
+        "input_tokens": meta.input_tokens if meta else None,
+        "error": "; ".join(errors) or None,
+    })
+
+
+def _error_record(step: int, results: list[ActionResult] | None) -> dict[str, Any]:
+    """Record for a step that failed before browser-use added a history item."""
+    errors = [r.error for r in results or [] if r.error]
+    return _redact({
+        "step": step,
+        "actions": [],
+        "url": None,
+        "duration_s": None,
+        "input_tokens": None,
+        "error": "; ".join(errors) or "Step failed without a history item",
+    })
+
+
 async def scan_operator_run(
     target: str,
     scan_type: str,
     scan_name: str,
     folder: Folder,
-) -> str:
+    *,
+    job_id: str,
+) -> None:
     """
     Run the browser-automation “operator” that creates & launches a Nessus scan.
 
-    Returns
-    -------
-    str
-        Formatted run-log (repr of AgentHistoryList)
+    Each step is written to `trace_store` under *job_id* as soon as it ends;
+    query it through ``GET /traces``.  The trace is marked ``failed`` unless the
+    agent reports the task as done and successful.
     """
     MAX_STEPS = 25
     WIDTH, HEIGHT = 1440, 736
@@ -105,16 +161,68 @@ async def scan_operator_run(
         llm=llm,
         enable_memory=False,
         browser_session=browser_session,
+        sensitive_data=SENSITIVE_DATA,
     )
 
+    written = 0  # history items already in the trace
+    seq = 0  # trace records written (a failed step may add no history item)
+
+    async def _write(build: Callable[[], dict[str, Any]]) -> None:
+        # Tracing is best-effort: nothing here may abort the operator run.
+        nonlocal seq
+        try:
+            record = build()
+            seq += 1
+            await asyncio.to_thread(trace_store.add_step, job_id, seq, record)
+        except Exception:
+            logger.warning("Failed to write operator trace step", exc_info=True)
+
+    async def _flush_history() -> bool:
+        nonlocal written
+        history = agent.state.history.history
+        if len(history) <= written:
+            return False
+        for item in history[written:]:
+            written += 1
+            await _write(lambda: _step_record(item, agent.state.n_steps))
+            item.state.screenshot = None  # already summarised; don't hold it in memory
+        return True
+
+    async def _on_step_end(agent: Agent) -> None:
+        try:
+            if not await _flush_history():
+                await _write(
+                    lambda: _error_record(agent.state.n_steps, agent.state.last_result)
+                )
+        except Exception:
+            logger.warning("Failed to trace operator step", exc_info=True)
+
+    status, error = "failed", "Cancelled before completion"
+    await asyncio.to_thread(trace_store.start, job_id, scan_name)
     try:
-        agent_history = await agent.run(max_steps=MAX_STEPS)
-        logger.info("Operator completed successfully: %s", scan_name)
-        return repr(agent_history)
-    except Exception:
+        agent_history = await agent.run(max_steps=MAX_STEPS, on_step_end=_on_step_end)
+        if agent_history.is_done() and agent_history.is_successful() is not False:
+            status, error = "completed", None
+            logger.info("Operator completed successfully: %s", scan_name)
+        else:
+            # e.g. max steps / consecutive failures: browser-use returns normally
+            errors = [e for e in agent_history.errors() if e]
+            error = errors[-1] if errors else "Agent did not report success"
+            logger.warning("Operator did not succeed for scan %s: %s", scan_name, error)
+    except Exception as exc:
+        error = str(exc) or type(exc).__name__
         logger.exception("Operator failed for scan %s", scan_name)
         raise
     finally:
+        # Final-error items are appended after the last on_step_end hook.
+        try:
+            await _flush_history()
+        except Exception:
+            logger.warning("Failed to flush final operator trace steps", exc_info=True)
+        try:
+            await asyncio.to_thread(trace_store.finish, job_id, status, error)
+        except Exception:
+            logger.warning("Failed to finish operator trace", exc_info=True)
         # Gracefully close the browser even on failure
         try:
             await browser_session.close()  # silently ignore if not supported
@@ -45,6 +45,8 @@ NESSUS_SECRET_KEY: str = _conf["nessus"]["secret_key"]
 NESSUS_AUTH_HEADER: dict[str, str] = {
     "X-ApiKeys": f"accessKey={NESSUS_ACCESS_KEY}; secretKey={NESSUS_SECRET_KEY};"
 }
+# Optional; keeps a hung Nessus call from holding shared locks indefinitely.
+NESSUS_TIMEOUT_S: float = _conf["nessus"].get("request_timeout_s", 30)
 
 # ——————————————————— LLM ———————————————————
 GOOGLE_API_KEY: str = _conf["llm"]["google_api_key"]
@@ -53,3 +55,24 @@ LLM_MODEL: str = _conf["llm"]["model"]
 # ——————————————————— Dev ———————————————————
 SSL_VERIFY: bool = _conf["dev"]["ssl_verify"]
 IS_HEADLESS: bool = _conf["dev"]["headless_operator"]
+
+# ——————————————————— Shared state (multi-worker) ———————————————————
+# Optional section: defaults keep a single-host deployment working unchanged.
+_shared = _conf.get("shared_state", {})
+SHARED_STATE_BACKEND: str = _shared.get("backend", "sqlite")
+SHARED_SQLITE_PATH: Path = PROJECT_ROOT / _shared.get(
+    "sqlite_path", ".state/shared-state.sqlite3"
+)
+SHARED_REDIS_URL: str = _shared.get("redis_url", "redis://localhost:6379/0")
+SHARED_CACHE_TTL_S: float = _shared.get("cache_ttl_s", 30)
+SHARED_JOB_TTL_S: int = _shared.get("job_ttl_s", 7 * 24 * 3600)
+MAX_CONCURRENT_OPERATORS: int = _shared.get("max_concurrent_operators", 1)
+OPERATOR_QUEUE_TIMEOUT_S: float = _shared.get("operator_queue_timeout_s", 600)
+
+# ——————————————————— Operator traces ———————————————————
+_traces = _conf.get("traces", {})
+TRACE_SQLITE_PATH: Path = PROJECT_ROOT / _traces.get(
+    "sqlite_path", ".state/operator-traces.sqlite3"
+)
+TRACE_MAX_BYTES: int = _traces.get("max_bytes", 64 * 1024 * 1024)
+TRACE_STALE_AFTER_S: int = _traces.get("stale_after_s", 3600)
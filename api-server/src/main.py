@@ -3,14 +3,17 @@ from __future__ import annotations
 import asyncio
 import logging
 import sys
+import time
 from typing import Any
 
 import requests
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 
 import browser_tasks
 import conf
 import service
+import shared_state
+import trace_store
 import utils
 from models import (
     CreateFolderRequest,
@@ -18,6 +21,9 @@ from models import (
     Folder,
     GetSessionTokenRequest,
     ListScansItem,
+    OperatorJob,
+    OperatorJobStatus,
+    OperatorTrace,
     ScanResult,
     ScanResultHost,
     ScanStatus,
@@ -50,6 +56,7 @@ def _proxy_request(
 ) -> requests.Response:
     """Wrapper that adds robust error handling to outbound requests."""
     try:
+        kwargs.setdefault("timeout", conf.NESSUS_TIMEOUT_S)
         r = requests.request(method, url, verify=conf.SSL_VERIFY, **kwargs)
         r.raise_for_status()
         return r
@@ -58,6 +65,13 @@ def _proxy_request(
         raise HTTPException(status_code=502, detail=str(exc)) from exc
 
 
+async def _update_job(
+    job: OperatorJob, status: OperatorJobStatus, error: str | None = None
+) -> None:
+    job.status, job.error, job.updated_at = status, error, time.time()
+    await asyncio.to_thread(shared_state.put_job, job.id, job.model_dump(mode="json"))
+
+
 # ——————————————————— endpoints ———————————————————
 @app.post("/session")
 def get_session_token(body: GetSessionTokenRequest) -> str:
@@ -92,61 +106,173 @@ def create_folder(req: Request, body: CreateFolderRequest) -> Response:
     )
 
 
-@app.post("/start_scan")
-async def start_scan(body: StartScanRequest, req: Request) -> StartScanResponse:
+def _job_error(job: OperatorJob, status_code: int, error: str) -> HTTPException:
+    """Error response that still tells the caller which job / trace to look up."""
+    return HTTPException(
+        status_code=status_code,
+        detail={"error": error, "job_id": job.id, "scan_name": job.scan_name},
+    )
+
+
+async def _prepare_job(
+    body: StartScanRequest, auth_headers: dict[str, str]
+) -> tuple[OperatorJob, Folder]:
+    # Service calls may block on Nessus or on a cross-worker lock; keep them
+    # off the event loop so in-flight operator runs in this worker keep going.
     folder_name = "nessus-controller"
-    folder_id = service.get_folder_id(
+    folder_id = await asyncio.to_thread(
+        service.get_folder_id,
         name=folder_name,
         create_if_not_exists=True,
-        auth_headers=utils.nessus_auth_header(req.headers),
+        auth_headers=auth_headers,
     )
-    folder = service.get_folder(
-        folder_id=folder_id, auth_headers=utils.nessus_auth_header(req.headers)
+    folder = await asyncio.to_thread(
+        service.get_folder, folder_id=folder_id, auth_headers=auth_headers
+    )
+
+    now = time.time()
+    job = OperatorJob(
+        id=utils.build_job_id(),
+        scan_name=utils.build_scan_name(body.scan_name_prefix),
+        target=body.target,
+        scan_type=body.scan_type,
+        status=OperatorJobStatus.queued,
+        created_at=now,
+        updated_at=now,
     )
-    unique_scan_name = utils.build_scan_name(body.scan_name_prefix)
+    await _update_job(job, OperatorJobStatus.queued)
+    return job, folder
 
+
+async def _run_job(
+    job: OperatorJob, folder: Folder, auth_headers: dict[str, str]
+) -> int:
+    """Wait for an operator slot, run the operator and resolve the new scan id."""
     try:
-        log = await browser_tasks.scan_operator_run(
-            body.target, body.scan_type, unique_scan_name, folder
+        try:
+            # Browser operators are capped across *all* workers, not per process.
+            async with shared_state.operator_slot():
+                await _update_job(job, OperatorJobStatus.running)
+                await browser_tasks.scan_operator_run(
+                    job.target, job.scan_type, job.scan_name, folder, job_id=job.id
+                )
+        except shared_state.OperatorSlotTimeout as exc:
+            logger.warning("Job %s not started: %s", job.id, exc)
+            raise _job_error(job, 503, str(exc)) from exc
+        except Exception as exc:
+            logger.exception("Operator run failed")
+            raise _job_error(job, 500, str(exc)) from exc
+
+        scan_ids = await asyncio.to_thread(
+            service.get_scan_id,
+            name=job.scan_name,
+            folder_id=folder.id,
+            auth_headers=auth_headers,
         )
-        logger.debug("Operator log: %s", log)
-    except Exception as exc:
-        logger.exception("Operator run failed")
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
-
-    scan_ids = service.get_scan_id(
-        name=unique_scan_name,
-        folder_id=folder_id,
-        auth_headers=utils.nessus_auth_header(req.headers),
+
+        if len(scan_ids) != 1:
+            msg = (
+                "Internal Error: scan ID not unique"
+                if len(scan_ids) > 1
+                else "Internal Error: scan ID not found"
+            )
+            logger.error(msg)
+            raise _job_error(job, 500, msg)
+    except BaseException as exc:
+        # Includes CancelledError (client disconnect) so no job is left "running".
+        if isinstance(exc, HTTPException):
+            error = exc.detail["error"]
+        elif isinstance(exc, asyncio.CancelledError):
+            error = "Cancelled before completion"
+        else:
+            error = str(exc) or type(exc).__name__
+        await _update_job(job, OperatorJobStatus.failed, error)
+        raise
+
+    job.scan_id = scan_ids[0]
+    await _update_job(job, OperatorJobStatus.completed)
+    return job.scan_id
+
+
+async def _run_job_in_background(
+    job: OperatorJob, folder: Folder, auth_headers: dict[str, str]
+) -> None:
+    try:
+        await _run_job(job, folder, auth_headers)
+    except HTTPException:
+        pass  # already logged and recorded on the job
+
+
+# Strong references so queued jobs aren't garbage-collected mid-run.
+_background_jobs: set[asyncio.Task] = set()
+
+
+@app.post("/start_scan")
+async def start_scan(body: StartScanRequest, req: Request) -> StartScanResponse:
+    auth_headers = utils.nessus_auth_header(req.headers)
+    job, folder = await _prepare_job(body, auth_headers)
+    scan_id = await _run_job(job, folder, auth_headers)
+    return StartScanResponse(
+        ok=True, scan_id=scan_id, scan_name=job.scan_name, job_id=job.id
     )
 
-    if len(scan_ids) != 1:
-        msg = (
-            "Internal Error: scan ID not unique"
-            if len(scan_ids) > 1
-            else "Internal Error: scan ID not found"
-        )
-        logger.error(msg)
-        raise HTTPException(status_code=500, detail=msg)
-    return StartScanResponse(ok=True, scan_id=scan_ids[0], scan_name=unique_scan_name)
+
+@app.post("/jobs", status_code=202)
+async def submit_scan_job(body: StartScanRequest, req: Request) -> OperatorJob:
+    """Queue a scan and return its job at once; poll ``GET /jobs/{job_id}``."""
+    auth_headers = utils.nessus_auth_header(req.headers)
+    job, folder = await _prepare_job(body, auth_headers)
+    snapshot = job.model_copy()
+    task = asyncio.create_task(_run_job_in_background(job, folder, auth_headers))
+    _background_jobs.add(task)
+    task.add_done_callback(_background_jobs.discard)
+    return snapshot
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> OperatorJob:
+    record = shared_state.get_job(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return OperatorJob.model_validate(record)
+
+
+@app.get("/traces")
+def list_traces(
+    scan_name: str | None = None,
+    job_id: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+) -> list[OperatorTrace]:
+    traces = trace_store.query(scan_name=scan_name, job_id=job_id, limit=limit)
+    return [OperatorTrace.model_validate(t) for t in traces]
 
 
 @app.get("/list_scan_templates")
 def list_scan_templates(req: Request) -> list[ScanTemplate]:
-    r = _proxy_request(
-        "GET",
-        conf.NESSUS_URL + "/editor/scan/templates",
-        headers=utils.nessus_auth_header(req.headers),
-    )
-    templates = r.json().get("templates", [])
-    return [
-        ScanTemplate(
-            title=t["title"],
-            uuid=t["uuid"],
-            desc=t.get("desc", ""),
+    auth_headers = utils.nessus_auth_header(req.headers)
+
+    def _fetch() -> list[ScanTemplate]:
+        r = _proxy_request(
+            "GET",
+            conf.NESSUS_URL + "/editor/scan/templates",
+            headers=auth_headers,
         )
-        for t in templates
-    ]
+        templates = r.json().get("templates", [])
+        return [
+            ScanTemplate(
+                title=t["title"],
+                uuid=t["uuid"],
+                desc=t.get("desc", ""),
+            )
+            for t in templates
+        ]
+
+    return shared_state.cached(
+        f"templates:{shared_state.auth_scope(auth_headers)}",
+        _fetch,
+        dump=lambda templates: [t.model_dump() for t in templates],
+        load=lambda raw: [ScanTemplate.model_validate(t) for t in raw],
+    )
 
 
 @app.get("/list_scans")
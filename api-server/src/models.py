@@ -25,6 +25,41 @@ class StartScanResponse(BaseModel):
     ok: bool
     scan_id: int
     scan_name: str
+    job_id: str
+
+class OperatorJobStatus(StrEnum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class OperatorJob(BaseModel):
+    id: str
+    scan_name: str
+    target: str
+    scan_type: str
+    status: OperatorJobStatus
+    created_at: float
+    updated_at: float
+    scan_id: int | None = None
+    error: str | None = None
+
+class OperatorTraceStep(BaseModel):
+    step: int
+    actions: list[dict]
+    url: str | None
+    duration_s: float | None
+    input_tokens: int | None
+    error: str | None
+
+class OperatorTrace(BaseModel):
+    job_id: str
+    scan_name: str
+    status: str
+    error: str | None
+    started_at: float
+    finished_at: float | None
+    steps: list[OperatorTraceStep]
 
 class ScanTemplate(BaseModel):
     title: str
@@ -8,6 +8,7 @@ import requests
 from fastapi import HTTPException, Response
 
 import conf
+import shared_state
 from models import ExportFormat, Folder, ListScansItem
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,7 @@ logger = logging.getLogger(__name__)
 def _safe_request(method: str, url: str, **kwargs: Any) -> requests.Response:
     """Wrap `requests` with consistent error handling & logging."""
     try:
+        kwargs.setdefault("timeout", conf.NESSUS_TIMEOUT_S)
         r = requests.request(method, url, verify=conf.SSL_VERIFY, **kwargs)
         r.raise_for_status()
         return r
@@ -25,10 +27,22 @@ def _safe_request(method: str, url: str, **kwargs: Any) -> requests.Response:
 
 
 # ——————————————————— folders ———————————————————
+def _folders_cache_key(auth_headers) -> str:
+    return f"folders:{shared_state.auth_scope(auth_headers)}"
+
+
 def list_folders(auth_headers) -> list[Folder]:
-    r = _safe_request("GET", conf.NESSUS_URL + "/folders", headers=auth_headers)
-    raw_folders = r.json().get("folders", [])
-    return [Folder.model_validate(f) for f in raw_folders]
+    def _fetch() -> list[Folder]:
+        r = _safe_request("GET", conf.NESSUS_URL + "/folders", headers=auth_headers)
+        raw_folders = r.json().get("folders", [])
+        return [Folder.model_validate(f) for f in raw_folders]
+
+    return shared_state.cached(
+        _folders_cache_key(auth_headers),
+        _fetch,
+        dump=lambda folders: [f.model_dump() for f in folders],
+        load=lambda raw: [Folder.model_validate(f) for f in raw],
+    )
 
 
 def create_folder(name: str, auth_headers) -> Response:
@@ -38,6 +52,7 @@ def create_folder(name: str, auth_headers) -> Response:
         json={"name": name},
         headers=auth_headers,
     )
+    shared_state.cache_delete(_folders_cache_key(auth_headers))
     return Response(
         status_code=r.status_code,
         headers=r.headers,
@@ -63,16 +78,23 @@ def get_folder_id(name: str, auth_headers, *, create_if_not_exists: bool = False
     if not create_if_not_exists:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    logger.info("Folder '%s' not found; creating.", name)
-    create_resp = create_folder(name, auth_headers)
-    if create_resp.status_code != 200:
-        raise HTTPException(
-            status_code=create_resp.status_code,
-            detail=create_resp.content.decode(),
-            headers=dict(create_resp.headers),
-        )
+    # Only one worker may create the folder; the rest re-check once it exists.
+    with shared_state.single_flight(f"folder-create:{name.lower()}"):
+        shared_state.cache_delete(_folders_cache_key(auth_headers))
+        folder_id = _search()
+        if folder_id is not None:
+            return folder_id
 
-    folder_id = _search()
+        logger.info("Folder '%s' not found; creating.", name)
+        create_resp = create_folder(name, auth_headers)
+        if create_resp.status_code != 200:
+            raise HTTPException(
+                status_code=create_resp.status_code,
+                detail=create_resp.content.decode(),
+                headers=dict(create_resp.headers),
+            )
+
+        folder_id = _search()
     if folder_id is None:
         raise HTTPException(
             status_code=500, detail="Folder creation acknowledged but not found"
@@ -0,0 +1,384 @@
+"""
+Cross-worker shared state.
+
+Every uvicorn worker is a separate process, so anything kept in module globals
+(caches, locks, job records, concurrency limits) would be multiplied by the
+worker count.  This module keeps that state in a store every worker can see:
+
+* ``sqlite`` (default) – a WAL-mode SQLite file on local disk; good for any
+  number of workers on a single host.
+* ``redis``  – any Redis-compatible server; needed once workers span hosts.
+  Requires the optional ``redis`` package.
+
+The rest of the app only uses the helpers at the bottom of this file.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable, Iterator
+from functools import cache
+from typing import Any, TypeVar
+
+import conf
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_POLL_INTERVAL_S = 0.25
+OPERATOR_LEASE_TTL_S = 120
+
+
+class OperatorSlotTimeout(TimeoutError):
+    """No operator slot freed up within ``shared_state.operator_queue_timeout_s``."""
+
+
+# ——————————————————— backends ———————————————————
+class _SqliteBackend:
+    """SQLite file shared by all workers on the host (one connection per call)."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT NOT NULL, holder TEXT NOT NULL, expires_at REAL NOT NULL,
+            PRIMARY KEY (name, holder)
+        );
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self._SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def cache_get(self, key: str) -> str | None:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def cache_set(self, key: str, value: str, ttl_s: float) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_s),
+            )
+
+    def cache_delete(self, key: str) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def try_acquire(self, name: str, holder: str, limit: int, ttl_s: float) -> bool:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")  # serialises acquirers across processes
+            try:
+                db.execute(
+                    "DELETE FROM leases WHERE name = ? AND expires_at <= ?", (name, now)
+                )
+                (held,) = db.execute(
+                    "SELECT COUNT(*) FROM leases WHERE name = ?", (name,)
+                ).fetchone()
+                acquired = held < limit
+                if acquired:
+                    db.execute(
+                        "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                        (name, holder, now + ttl_s),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return acquired
+
+    def renew(self, name: str, holder: str, ttl_s: float) -> bool:
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND holder = ?",
+                (time.time() + ttl_s, name, holder),
+            )
+        return cur.rowcount > 0
+
+    def release(self, name: str, holder: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder)
+            )
+
+    def job_put(self, job_id: str, data: str) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM jobs WHERE updated_at <= ?", (now - conf.SHARED_JOB_TTL_S,)
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, updated_at) VALUES (?, ?, ?)",
+                (job_id, data, now),
+            )
+
+    def job_get(self, job_id: str) -> str | None:
+        with self._connect() as db:
+            row = db.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+
+class _RedisBackend:
+    """Redis-compatible server shared by workers on any host."""
+
+    # The key itself expires with its longest-lived lease.
+    _EXPIRE_WITH_LAST_LUA = """
+        local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+        redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(last[2])))
+    """
+
+    # Expire stale leases, then add ours only if the set is below *limit*.
+    _ACQUIRE_LUA = """
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+        if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+            redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    """ + _EXPIRE_WITH_LAST_LUA + """
+            return 1
+        end
+        return 0
+    """
+
+    # Extend our lease only if it still exists (it may have expired already).
+    _RENEW_LUA = """
+        if redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+            redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+    """ + _EXPIRE_WITH_LAST_LUA + """
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, url: str) -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "shared_state.backend = 'redis' requires the `redis` package"
+            ) from exc
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._acquire = self._r.register_script(self._ACQUIRE_LUA)
+        self._renew = self._r.register_script(self._RENEW_LUA)
+
+    def cache_get(self, key: str) -> str | None:
+        return self._r.get(f"cache:{key}")
+
+    def cache_set(self, key: str, value: str, ttl_s: float) -> None:
+        self._r.set(f"cache:{key}", value, px=int(ttl_s * 1000))
+
+    def cache_delete(self, key: str) -> None:
+        self._r.delete(f"cache:{key}")
+
+    def try_acquire(self, name: str, holder: str, limit: int, ttl_s: float) -> bool:
+        now = time.time()
+        return bool(
+            self._acquire(keys=[f"lease:{name}"], args=[now, now + ttl_s, limit, holder])
+        )
+
+    def renew(self, name: str, holder: str, ttl_s: float) -> bool:
+        return bool(
+            self._renew(keys=[f"lease:{name}"], args=[time.time() + ttl_s, holder])
+        )
+
+    def release(self, name: str, holder: str) -> None:
+        self._r.zrem(f"lease:{name}", holder)
+
+    def job_put(self, job_id: str, data: str) -> None:
+        self._r.set(f"job:{job_id}", data, ex=conf.SHARED_JOB_TTL_S)
+
+    def job_get(self, job_id: str) -> str | None:
+        return self._r.get(f"job:{job_id}")
+
+
+@cache
+def _backend() -> _SqliteBackend | _RedisBackend:
+    """Lazily open the configured backend once per worker process."""
+    if conf.SHARED_STATE_BACKEND == "redis":
+        logger.info("Shared state: redis at %s", conf.SHARED_REDIS_URL)
+        return _RedisBackend(conf.SHARED_REDIS_URL)
+    if conf.SHARED_STATE_BACKEND == "sqlite":
+        logger.info("Shared state: sqlite at %s", conf.SHARED_SQLITE_PATH)
+        return _SqliteBackend(str(conf.SHARED_SQLITE_PATH))
+    raise RuntimeError(f"Unknown shared_state.backend: {conf.SHARED_STATE_BACKEND!r}")
+
+
+# ——————————————————— helpers ———————————————————
+def auth_scope(auth_headers: dict[str, str]) -> str:
+    """Stable, non-reversible key for *auth_headers* so callers never share cache."""
+    raw = json.dumps(auth_headers, sort_keys=True).encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def cache_delete(key: str) -> None:
+    _backend().cache_delete(key)
+
+
+def _keep_alive(
+    backend: _SqliteBackend | _RedisBackend,
+    name: str,
+    holder: str,
+    limit: int,
+    ttl_s: float,
+) -> bool:
+    """Renew *holder*'s lease, re-acquiring it if it already expired; False if lost."""
+    if backend.renew(name, holder, ttl_s):
+        return True
+    logger.warning("Lease %s on %s expired before renewal; re-acquiring", holder, name)
+    return backend.try_acquire(name, holder, limit, ttl_s)
+
+
+@contextlib.contextmanager
+def single_flight(name: str, *, ttl_s: float = 60) -> Iterator[None]:
+    """
+    Block until this worker is the only one (on any process) holding *name*.
+
+    A background thread renews the lease every ``ttl_s / 3`` while held.
+    """
+    holder = uuid.uuid4().hex
+    backend = _backend()
+    lock_name = f"lock:{name}"
+    while not backend.try_acquire(lock_name, holder, 1, ttl_s):
+        time.sleep(_POLL_INTERVAL_S)
+
+    stop = threading.Event()
+
+    def _heartbeat() -> None:
+        while not stop.wait(ttl_s / 3):
+            try:
+                if not _keep_alive(backend, lock_name, holder, 1, ttl_s):
+                    logger.error("Lost single-flight lock %s to another worker", name)
+            except Exception:
+                logger.warning("Failed to renew single-flight lock", exc_info=True)
+
+    heartbeat = threading.Thread(target=_heartbeat, daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        heartbeat.join()
+        backend.release(lock_name, holder)
+
+
+def cached(
+    key: str,
+    compute: Callable[[], T],
+    *,
+    dump: Callable[[T], Any],
+    load: Callable[[Any], T],
+    ttl_s: float | None = None,
+) -> T:
+    """
+    Return the shared cached value for *key*, computing it at most once.
+
+    Concurrent misses across workers are collapsed with :func:`single_flight`,
+    so a cold cache costs one upstream call rather than one per worker.
+    """
+    ttl_s = conf.SHARED_CACHE_TTL_S if ttl_s is None else ttl_s
+    if ttl_s <= 0:
+        return compute()
+
+    backend = _backend()
+    if (hit := backend.cache_get(key)) is not None:
+        return load(json.loads(hit))
+
+    with single_flight(f"cache:{key}"):
+        if (hit := backend.cache_get(key)) is not None:
+            return load(json.loads(hit))
+        value = compute()
+        backend.cache_set(key, json.dumps(dump(value)), ttl_s)
+        return value
+
+
+@contextlib.asynccontextmanager
+async def operator_slot(
+    *, ttl_s: float = OPERATOR_LEASE_TTL_S, timeout_s: float | None = None
+) -> AsyncIterator[None]:
+    """
+    Hold one of the ``max_concurrent_operators`` slots shared by all workers.
+
+    The lease is renewed every ``ttl_s / 3`` while held, so *ttl_s* only bounds
+    how long a crashed worker can keep a slot reserved, not the run length.
+    Raises :class:`OperatorSlotTimeout` if no slot frees up within *timeout_s*
+    (default ``shared_state.operator_queue_timeout_s``).
+    """
+    timeout_s = conf.OPERATOR_QUEUE_TIMEOUT_S if timeout_s is None else timeout_s
+    deadline = time.monotonic() + timeout_s
+    limit = conf.MAX_CONCURRENT_OPERATORS
+    holder = uuid.uuid4().hex
+    backend = _backend()
+    while not await asyncio.to_thread(
+        backend.try_acquire, "operator", holder, limit, ttl_s
+    ):
+        if time.monotonic() >= deadline:
+            raise OperatorSlotTimeout(
+                f"Timed out after {timeout_s:g}s waiting for an operator slot "
+                f"({limit} in use)"
+            )
+        await asyncio.sleep(_POLL_INTERVAL_S)
+
+    async def _heartbeat() -> None:
+        while True:
+            await asyncio.sleep(ttl_s / 3)
+            try:
+                held = await asyncio.to_thread(
+                    _keep_alive, backend, "operator", holder, limit, ttl_s
+                )
+            except Exception:
+                logger.warning("Failed to renew operator slot lease", exc_info=True)
+                continue
+            if not held:
+                logger.error(
+                    "Operator slot lease %s lost to another worker; "
+                    "max_concurrent_operators is exceeded until it is re-acquired",
+                    holder,
+                )
+
+    heartbeat = asyncio.create_task(_heartbeat())
+    try:
+        yield
+    finally:
+        heartbeat.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await heartbeat
+        await asyncio.to_thread(backend.release, "operator", holder)
+
+
+def put_job(job_id: str, record: dict[str, Any]) -> None:
+    _backend().job_put(job_id, json.dumps(record))
+
+
+def get_job(job_id: str) -> dict[str, Any] | None:
+    raw = _backend().job_get(job_id)
+    return json.loads(raw) if raw is not None else None
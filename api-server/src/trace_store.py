@@ -0,0 +1,164 @@
+"""
+On-disk store for browser-operator traces.
+
+Each operator run gets one trace row plus one zlib-compressed JSON record per
+agent step (action, URL, duration, token count, error).  Steps are written as
+they finish, so the worker never has to hold the full agent history, and the
+oldest finished (or stale) traces are evicted once the store exceeds
+``traces.max_bytes``.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from collections.abc import Iterator
+from functools import cache
+from typing import Any
+
+import conf
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS traces (
+        job_id TEXT PRIMARY KEY,
+        scan_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        error TEXT,
+        started_at REAL NOT NULL,
+        finished_at REAL,
+        size_bytes INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS traces_scan_name ON traces (scan_name);
+    CREATE TABLE IF NOT EXISTS steps (
+        job_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (job_id, seq)
+    );
+"""
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    _init()
+    db = sqlite3.connect(conf.TRACE_SQLITE_PATH, timeout=10, isolation_level=None)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@cache
+def _init() -> None:
+    """Create the store once per worker process."""
+    os.makedirs(conf.TRACE_SQLITE_PATH.parent, exist_ok=True)
+    db = sqlite3.connect(conf.TRACE_SQLITE_PATH, timeout=10, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+    finally:
+        db.close()
+
+
+def _enforce_retention(db: sqlite3.Connection) -> None:
+    """
+    Drop the oldest traces until the store fits in ``traces.max_bytes``.
+
+    Unfinished traces are kept unless older than ``traces.stale_after_s``
+    (their worker crashed or never reached `finish`).
+    """
+    (total,) = db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM traces").fetchone()
+    if total <= conf.TRACE_MAX_BYTES:
+        return
+    rows = db.execute(
+        "SELECT job_id, size_bytes FROM traces "
+        "WHERE finished_at IS NOT NULL OR started_at < ? ORDER BY started_at",
+        (time.time() - conf.TRACE_STALE_AFTER_S,),
+    ).fetchall()
+    for job_id, size in rows:
+        if total <= conf.TRACE_MAX_BYTES:
+            break
+        db.execute("DELETE FROM steps WHERE job_id = ?", (job_id,))
+        db.execute("DELETE FROM traces WHERE job_id = ?", (job_id,))
+        total -= size
+        logger.debug("Evicted trace %s (%d bytes)", job_id, size)
+
+
+# ——————————————————— writers ———————————————————
+def start(job_id: str, scan_name: str) -> None:
+    with _connect() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO traces (job_id, scan_name, status, started_at) "
+            "VALUES (?, ?, 'running', ?)",
+            (job_id, scan_name, time.time()),
+        )
+        _enforce_retention(db)
+
+
+def add_step(job_id: str, seq: int, record: dict[str, Any]) -> None:
+    """Append *record* as the *seq*-th entry of the trace (each *seq* written once)."""
+    blob = zlib.compress(json.dumps(record, default=str).encode())
+    with _connect() as db:
+        db.execute(
+            "INSERT INTO steps (job_id, seq, data) VALUES (?, ?, ?)",
+            (job_id, seq, blob),
+        )
+        db.execute(
+            "UPDATE traces SET size_bytes = size_bytes + ? WHERE job_id = ?",
+            (len(blob), job_id),
+        )
+
+
+def finish(job_id: str, status: str, error: str | None = None) -> None:
+    with _connect() as db:
+        db.execute(
+            "UPDATE traces SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            (status, error, time.time(), job_id),
+        )
+        _enforce_retention(db)
+
+
+# ——————————————————— readers ———————————————————
+def query(
+    *, scan_name: str | None = None, job_id: str | None = None, limit: int = 20
+) -> list[dict[str, Any]]:
+    """Newest-first traces matching the given filters, steps decompressed."""
+    where, params = [], []
+    if scan_name is not None:
+        where.append("scan_name = ?")
+        params.append(scan_name)
+    if job_id is not None:
+        where.append("job_id = ?")
+        params.append(job_id)
+    sql = (
+        "SELECT job_id, scan_name, status, error, started_at, finished_at FROM traces"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY started_at DESC LIMIT ?"
+    )
+
+    with _connect() as db:
+        traces = [
+            dict(
+                zip(
+                    ("job_id", "scan_name", "status", "error", "started_at", "finished_at"),
+                    row,
+                )
+            )
+            for row in db.execute(sql, (*params, limit)).fetchall()
+        ]
+        for trace in traces:
+            trace["steps"] = [
+                json.loads(zlib.decompress(data))
+                for (data,) in db.execute(
+                    "SELECT data FROM steps WHERE job_id = ? ORDER BY seq",
+                    (trace["job_id"],),
+                )
+            ]
+    return traces
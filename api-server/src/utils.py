@@ -44,3 +44,8 @@ def build_scan_name(prefix: str = "") -> str:
     """Timestamp + short-uuid for guaranteed uniqueness (safe for Nessus UI)."""
     now = dt.datetime.now().astimezone()
     return f"{prefix}{now:%y%m%d-%H%M%S}-{uuid()}"
+
+
+def build_job_id() -> str:
+    """Opaque id for an operator job record (see `shared_state`)."""
+    return uuid()